@@ -0,0 +1,414 @@
+import numpy as np
+from numba import njit, prange
+
+
+def pack_mask(mask: np.ndarray) -> np.ndarray:
+    """
+    Pack a boolean array into 64 flags per word.
+
+    Flag i is stored in bit i % 64 of word i // 64. An extra zero word is
+    appended so that a window can always read the word after the one it
+    starts in.
+
+    Args:
+        mask: The boolean array to pack
+
+    Returns:
+        The packed flags as an array of uint64 words.
+    """
+    packed = np.packbits(mask, bitorder="little")
+    words = np.zeros((len(mask) // 64 + 2) * 8, dtype=np.uint8)
+    words[:len(packed)] = packed
+    return words.view("<u8")
+
+
+@njit(cache=True)
+def popcount(word: np.uint64) -> np.uint64:
+    """
+    Count the set bits of a word with the branchless SWAR bit hack.
+    """
+    word = word - ((word >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    word = (
+        (word & np.uint64(0x3333333333333333))
+        + ((word >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    )
+    word = (word + (word >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (word * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+@njit(cache=True)
+def window_popcounts(
+    words: np.ndarray,
+    n_points: int,
+    window_size: int
+) -> np.ndarray:
+    """
+    Count the flags set in every window of a given size for a packed mask.
+
+    Each window is read as at most 64 bits at a time, spliced from the two
+    words it straddles, and counted with popcount.
+
+    Args:
+        words: The mask packed with pack_mask
+        n_points: The number of flags in the mask before packing
+        window_size: The static size of the window to use.
+
+    Returns:
+        An array with the count for each window, indexed by the start of the
+        window.
+    """
+    n_windows = max(n_points - window_size + 1, 0)
+    counts = np.zeros(n_windows, dtype=np.int64)
+    ones = ~np.uint64(0)
+
+    for start in range(n_windows):
+        position = start
+        remaining = window_size
+        count = np.uint64(0)
+        while remaining > 0:
+            width = min(remaining, 64)
+            word = position >> 6
+            offset = np.uint64(position & 63)
+            # shifting in two steps keeps the high word's shift below 64 bits
+            bits = (words[word] >> offset) | (
+                (words[word + 1] << np.uint64(1)) << (np.uint64(63) - offset)
+            )
+            count += popcount(bits & (ones >> np.uint64(64 - width)))
+            position += width
+            remaining -= width
+        counts[start] = count
+
+    return counts
+
+
+def count_outside(
+    above: np.ndarray,
+    below: np.ndarray,
+    n_points: int,
+    window_size: int,
+    fail_count: int
+) -> np.ndarray:
+    """
+    Detect the windows with too many points beyond either limit.
+
+    Args:
+        above: The packed flags of the points above the upper limit
+        below: The packed flags of the points below the lower limit
+        n_points: The number of points in the dataset
+        window_size: The static size of the window to use.
+        fail_count: The number of points beyond a limit that breaks the rule
+
+    Returns:
+        A boolean array flagging the failing windows, indexed by the start of
+        the window.
+    """
+    count_above = window_popcounts(above, n_points, window_size)
+    count_below = window_popcounts(below, n_points, window_size)
+    return (count_above >= fail_count) | (count_below >= fail_count)
+
+
+@njit(cache=True)
+def rolling_minmax(data: np.ndarray, window_size: int):
+    """
+    Compute the min and max of every window of a given size.
+
+    Uses a monotonic deque of indices for each side so every point is pushed
+    and popped at most once.
+
+    Args:
+        data: The data array to analyze
+        window_size: The static size of the window to use.
+
+    Returns:
+        The arrays of window minimums and maximums, indexed by the start of the
+        window.
+    """
+    n = len(data)
+    n_windows = max(n - window_size + 1, 0)
+    mins = np.empty(n_windows, dtype=np.float64)
+    maxs = np.empty(n_windows, dtype=np.float64)
+
+    min_queue = np.empty(n, dtype=np.int64)
+    max_queue = np.empty(n, dtype=np.int64)
+    min_head, min_tail = 0, 0
+    max_head, max_tail = 0, 0
+    for i in range(n):
+        point = data[i]
+        while min_tail > min_head and data[min_queue[min_tail - 1]] >= point:
+            min_tail -= 1
+        min_queue[min_tail] = i
+        min_tail += 1
+        while max_tail > max_head and data[max_queue[max_tail - 1]] <= point:
+            max_tail -= 1
+        max_queue[max_tail] = i
+        max_tail += 1
+
+        start = i - window_size + 1
+        if start < 0:
+            continue
+        if min_queue[min_head] < start:
+            min_head += 1
+        if max_queue[max_head] < start:
+            max_head += 1
+
+        mins[start] = data[min_queue[min_head]]
+        maxs[start] = data[max_queue[max_head]]
+
+    return mins, maxs
+
+
+@njit(cache=True)
+def cycle_mask(rising: np.ndarray, window_size: int) -> np.ndarray:
+    """
+    Detect a cycle of alternating data points in every window of a given size.
+
+    A window of points cycles when all of its window_size - 2 consecutive
+    pairs of steps change direction.
+
+    Args:
+        rising: A boolean array flagging the steps between consecutive points
+            that do not decrease
+        window_size: The static size of the window of points to use.
+
+    Returns:
+        A boolean array flagging the windows that follow a cycle pattern,
+        indexed by the start of the window.
+    """
+    n = len(rising) + 1
+    n_windows = max(n - window_size + 1, 0)
+    hits = np.zeros(n_windows, dtype=np.bool_)
+    needed = window_size - 2
+
+    # a direction change between steps j and j + 1 involves points j to j + 2
+    count = 0
+    for j in range(n - 2):
+        count += rising[j] ^ rising[j + 1]
+
+        start = j - needed + 1
+        if start < 0:
+            continue
+        if start > 0:
+            count -= rising[start - 1] ^ rising[start]
+
+        hits[start] = count == needed
+
+    return hits
+
+
+# rows of the hits array filled in by scan_all_rules, one per rule
+CONTROL_LIMIT = 0
+WARNING_LIMIT = 1
+ZONE_C_LIMIT = 2
+SINGLE_SIDE = 3
+RUN = 4
+CYCLE = 5
+ZONE_C_CYCLE = 6
+MISSING_ZONE_C = 7
+NEAR_LIMIT = 8
+N_RULES = 9
+
+
+@njit(cache=True)
+def scan_all_rules(
+    data: np.ndarray,
+    mean: float,
+    std: float,
+    window_sizes: np.ndarray,
+    sigmas: np.ndarray,
+    fail_counts: np.ndarray,
+    near: float,
+    hits: np.ndarray
+) -> None:
+    """
+    Run every rule in a single forward pass over the data.
+
+    Each window is tracked with a running count that adds the point (or step)
+    entering the window and removes the one leaving it, so every rule is
+    updated in constant time per point. The directions of the last 64 steps
+    are kept as bits of a word, so the changes of direction in the cycle
+    windows are counted with a XOR and a popcount instead of branches.
+
+    Args:
+        data: The data array to analyze
+        mean: The computed mean of the dataset
+        std: The computed standard deviation of the dataset
+        window_sizes: The window size of each rule, indexed by its row. Cycle
+            windows can be at most 65 points long.
+        sigmas: The number of standard deviations to the limits of each limit
+            rule, indexed by its row
+        fail_counts: The number of points beyond a limit that breaks each
+            limit rule, indexed by its row
+        near: The distance from the control and warning limits, in standard
+            deviations, that counts as near for Rule 10
+        hits: A zeroed boolean array of shape (N_RULES, len(data)) where each
+            failing window is flagged, indexed by the rule row and the start
+            of the window.
+    """
+    n = len(data)
+    ucl, lcl = mean + (3 * std), mean - (3 * std)
+    uwl, lwl = mean + (2 * std), mean - (2 * std)
+    url, lrl = mean + std, mean - std
+    band = near * std
+
+    limit_rows = np.array([CONTROL_LIMIT, WARNING_LIMIT, ZONE_C_LIMIT])
+    upper_limits = mean + (sigmas[limit_rows] * std)
+    lower_limits = mean - (sigmas[limit_rows] * std)
+    above = np.zeros(len(limit_rows), dtype=np.int64)
+    below = np.zeros(len(limit_rows), dtype=np.int64)
+
+    single_side_window = window_sizes[SINGLE_SIDE]
+    run_window = window_sizes[RUN]
+    cycle_window = window_sizes[CYCLE]
+    zone_c_cycle_window = window_sizes[ZONE_C_CYCLE]
+    missing_zone_c_window = window_sizes[MISSING_ZONE_C]
+    # a window of points has one fewer steps, and two fewer changes of
+    # direction between its steps
+    run_steps = run_window - 1
+    cycle_changes = cycle_window - 2
+    zone_c_cycle_changes = zone_c_cycle_window - 2
+    cycle_bits = (np.uint64(1) << np.uint64(cycle_changes)) - np.uint64(1)
+    zone_c_cycle_bits = (
+        (np.uint64(1) << np.uint64(zone_c_cycle_changes)) - np.uint64(1)
+    )
+
+    above_mean, below_mean = 0, 0
+    in_zone_missing, in_zone_cycle = 0, 0
+    rising_steps, falling_steps = 0, 0
+    # bit k holds whether the step k steps back decreased
+    directions = np.uint64(0)
+    previous_cycle = False
+
+    for i in range(n):
+        point = data[i]
+
+        # Rule 10 only looks at the current point
+        if (
+            (point < ucl and point > ucl - band)
+            or (point < uwl and point > uwl - band)
+            or (point > lcl and point < lcl + band)
+            or (point > lwl and point < lwl + band)
+        ):
+            hits[NEAR_LIMIT, i] = True
+
+        # Rules 1 to 3 count the points beyond their limits
+        for k in range(len(limit_rows)):
+            row = limit_rows[k]
+            window_size = window_sizes[row]
+            above[k] += point > upper_limits[k]
+            below[k] += point < lower_limits[k]
+            if i >= window_size:
+                leaving = data[i - window_size]
+                above[k] -= leaving > upper_limits[k]
+                below[k] -= leaving < lower_limits[k]
+
+            start = i - window_size + 1
+            if start >= 0:
+                hits[row, start] = (
+                    above[k] >= fail_counts[row] or below[k] >= fail_counts[row]
+                )
+
+        # points entering the windows
+        above_mean += point > mean
+        below_mean += point < mean
+        in_zone = point > lrl and point < url
+        in_zone_missing += in_zone
+        in_zone_cycle += in_zone
+
+        # points leaving the windows
+        if i >= single_side_window:
+            leaving = data[i - single_side_window]
+            above_mean -= leaving > mean
+            below_mean -= leaving < mean
+        if i >= missing_zone_c_window:
+            leaving = data[i - missing_zone_c_window]
+            in_zone_missing -= leaving > lrl and leaving < url
+        if i >= zone_c_cycle_window:
+            leaving = data[i - zone_c_cycle_window]
+            in_zone_cycle -= leaving > lrl and leaving < url
+
+        # steps entering and leaving the windows
+        if i >= 1:
+            step = point - data[i - 1]
+            rising_steps += step >= 0
+            falling_steps += step <= 0
+            directions = (directions << np.uint64(1)) | np.uint64(step < 0)
+            if i >= run_window:
+                step = data[i - run_steps] - data[i - run_window]
+                rising_steps -= step >= 0
+                falling_steps -= step <= 0
+
+        # XOR of neighbouring direction bits flags each change of direction,
+        # bit k being the change between the steps k and k + 1 steps back
+        alternating = directions ^ (directions >> np.uint64(1))
+
+        # windows ending at the current point
+        start = i - single_side_window + 1
+        if start >= 0:
+            hits[SINGLE_SIDE, start] = (
+                above_mean == single_side_window
+                or below_mean == single_side_window
+            )
+        start = i - missing_zone_c_window + 1
+        if start >= 0:
+            hits[MISSING_ZONE_C, start] = in_zone_missing == 0
+        start = i - run_window + 1
+        if start >= 0:
+            hits[RUN, start] = (
+                rising_steps == run_steps or falling_steps == run_steps
+            )
+        start = i - zone_c_cycle_window + 1
+        if start >= 0:
+            hits[ZONE_C_CYCLE, start] = (
+                popcount(alternating & zone_c_cycle_bits)
+                == zone_c_cycle_changes
+                and in_zone_cycle == zone_c_cycle_window
+            )
+        start = i - cycle_window + 1
+        if start >= 0:
+            # detects cycles larger than the window size
+            cycle = popcount(alternating & cycle_bits) == cycle_changes
+            hits[CYCLE, start] = cycle and not previous_cycle
+            previous_cycle = cycle
+
+
+@njit(cache=True, parallel=True)
+def scan_batch(
+    series: np.ndarray,
+    means: np.ndarray,
+    stds: np.ndarray,
+    window_sizes: np.ndarray,
+    sigmas: np.ndarray,
+    fail_counts: np.ndarray,
+    near: float,
+    hits: np.ndarray
+) -> None:
+    """
+    Run every rule over a batch of independent series in parallel.
+
+    Each series is scanned by scan_all_rules on its own thread, so the
+    parallelism is across series while the scan of a single series stays
+    the same.
+
+    Args:
+        series: A 2-D array with one series of equal length per row
+        means: The computed mean of each series
+        stds: The computed standard deviation of each series
+        window_sizes: The window size of each rule, as for scan_all_rules
+        sigmas: The limits of each limit rule, as for scan_all_rules
+        fail_counts: The fail count of each limit rule, as for scan_all_rules
+        near: The nearness to the limits for Rule 10, as for scan_all_rules
+        hits: A zeroed boolean array of shape
+            (len(series), N_RULES, series.shape[1]) where the failing windows
+            of each series are flagged.
+    """
+    for s in prange(series.shape[0]):
+        scan_all_rules(
+            series[s],
+            means[s],
+            stds[s],
+            window_sizes,
+            sigmas,
+            fail_counts,
+            near,
+            hits[s]
+        )
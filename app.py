@@ -1,25 +1,24 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
-import pandas as pd
 
-from rules import rules
+from rules import RuleContext, rules, run_all
 
 
-def generate_control_chart(data: list[float], mean: float, std: float, suffix: str="") -> None:
+def generate_control_chart(data: np.ndarray, mean: float, std: float, suffix: str="") -> None:
     plt.style.use('_mpl-gallery')
     fig, ax = plt.subplots(figsize=(12, 6))
 
     x = range(1, len(data)+1)
     ax.plot(x, data, 'o-')
 
-    ax.plot(x, [mean]*len(x), color='green', label='mean')
-    ax.plot(x, [mean + std]*len(x), color='purple', label='URL')
-    ax.plot(x, [mean - std]*len(x), color='purple', label='LRL')
-    ax.plot(x, [mean + (2*std)]*len(x), color='yellow', label='UWL')
-    ax.plot(x, [mean - (2*std)]*len(x), color='yellow', label='LWL')
-    ax.plot(x, [mean + (3*std)]*len(x), color='red', label='UCL')
-    ax.plot(x, [mean - (3*std)]*len(x), color='red', label='LCL')
+    ax.axhline(mean, color='green', label='mean')
+    ax.axhline(mean + std, color='purple', label='URL')
+    ax.axhline(mean - std, color='purple', label='LRL')
+    ax.axhline(mean + (2*std), color='yellow', label='UWL')
+    ax.axhline(mean - (2*std), color='yellow', label='LWL')
+    ax.axhline(mean + (3*std), color='red', label='UCL')
+    ax.axhline(mean - (3*std), color='red', label='LCL')
 
     ax.set_xlim(1, len(data)+1)
     ax.xaxis.set_major_locator(ticker.MaxNLocator(integer=True))
@@ -32,19 +31,33 @@ def generate_control_chart(data: list[float], mean: float, std: float, suffix: s
 
 # ===== Load the dataset =====
 datafile = "datasets/three.csv"
-data = list(pd.read_csv(datafile)['Value'])
+with open(datafile) as f:
+    value_column = f.readline().strip().split(',').index('Value')
+data = np.loadtxt(
+    datafile,
+    delimiter=',',
+    skiprows=1,
+    usecols=value_column,
+    dtype=np.float64,
+    ndmin=1
+)
 
-mean = np.mean(data, axis=0)
-std = np.std(data, axis=0)
+mean = np.mean(data)
+std = np.std(data)
 
 # ===== Generate control chart image =====
 generate_control_chart(data, mean, std, suffix=f"-{datafile.split('.')[0].split('/')[1]}")
 
 # ===== Run all rules =====
-issues = []
+verbose = False
+ctx = RuleContext(data, mean, std)
 
-for rule in rules:
-    issues = issues + rule.run(data, mean, std, verbose=False)
+if verbose:
+    issues = []
+    for rule in rules:
+        issues.extend(rule.run(ctx, verbose=True))
+else:
+    issues = run_all(ctx)
 
 print("===== Detected Events =====")
 for issue in issues:
@@ -0,0 +1,78 @@
+import glob
+import sys
+
+import numpy as np
+
+from rules import RuleContext, rules, run_all, run_batch
+
+
+def run_rules(ctx: RuleContext) -> list[tuple[str, int]]:
+    """
+    Execute each rule separately, as the verbose path of app.py does.
+    """
+    issues = []
+    for rule in rules:
+        issues.extend(rule.run(ctx))
+    return issues
+
+
+def make_series(rng: np.random.Generator) -> list[np.ndarray]:
+    """
+    Build series that exercise every rule, including empty and short series
+    and series with ties between consecutive points.
+    """
+    series = []
+    for n in list(range(0, 40)) + [200, 1000]:
+        alternating = np.where(np.arange(n) % 2, 1.0, -1.0)
+        # noise
+        series.append(rng.normal(size=n))
+        # few distinct values, so many ties
+        series.append(rng.integers(0, 4, size=n).astype(np.float64))
+        # random walk with flat steps
+        series.append(np.cumsum(rng.integers(-1, 2, size=n)).astype(np.float64))
+        # cycles, with outliers breaking zone C
+        cycle = alternating * rng.uniform(0.1, 0.3, size=n)
+        series.append(cycle)
+        if n:
+            cycle = cycle.copy()
+            cycle[rng.integers(0, n, size=n // 10 + 1)] = 5.0
+            series.append(cycle)
+
+    for datafile in sorted(glob.glob("datasets/*.csv")):
+        series.append(np.loadtxt(datafile, delimiter=',', skiprows=1, ndmin=1))
+
+    return series
+
+
+# ===== Compare the fused scan with the rules =====
+rng = np.random.default_rng(0)
+mismatches = 0
+checked = 0
+
+for data in make_series(rng):
+    mean = np.mean(data) if len(data) else 0.0
+    std = np.std(data) if len(data) else 0.0
+    ctx = RuleContext(data, mean, std)
+
+    expected = run_rules(ctx)
+    fused = run_all(ctx)
+    checked += 1
+    if fused != expected:
+        mismatches += 1
+        print(f"run_all mismatch for {len(data)} points:")
+        print(f"  rules:   {expected}")
+        print(f"  run_all: {fused}")
+
+# ===== Compare the batch scan with the rules =====
+batch = rng.normal(size=(16, 300))
+batch[::4] = np.where(np.arange(300) % 2, 1.0, -1.0) * rng.uniform(0.1, 0.3, 300)
+
+for data, issues in zip(batch, run_batch(batch)):
+    expected = run_rules(RuleContext(data, np.mean(data), np.std(data)))
+    checked += 1
+    if issues != expected:
+        mismatches += 1
+        print(f"run_batch mismatch for {len(data)} points")
+
+print(f"===== {checked} series checked, {mismatches} mismatches =====")
+sys.exit(1 if mismatches else 0)
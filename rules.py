@@ -1,17 +1,97 @@
-from utils import sliding_window, is_cycle
+from dataclasses import dataclass, field
+from functools import cached_property
+
+import numpy as np
+
+import _kernels
+from _kernels import (
+    count_outside,
+    cycle_mask,
+    pack_mask,
+    rolling_minmax,
+    scan_all_rules,
+    scan_batch,
+    window_popcounts
+)
+from utils import window_counts
+
+
+@dataclass
+class RuleContext:
+    """
+    A dataset and the values derived from it that are shared by all rules.
+
+    Each derived array is computed on first use and then kept, so the rules
+    reuse the same arrays instead of making their own pass over the data,
+    and the fused scan in run_all does not pay for arrays it never reads.
+    """
+    data: np.ndarray
+    mean: float
+    std: float
+    above: dict[int, np.ndarray] = field(init=False, default_factory=dict)
+    below: dict[int, np.ndarray] = field(init=False, default_factory=dict)
+
+    def __post_init__(self):
+        self.data = np.asarray(self.data, dtype=np.float64)
+
+    @cached_property
+    def in_zone(self) -> np.ndarray:
+        """
+        Flag the points within one standard deviation from the mean.
+        """
+        return (
+            (self.data > self.mean - self.std)
+            & (self.data < self.mean + self.std)
+        )
+
+    @cached_property
+    def steps(self) -> np.ndarray:
+        """
+        The differences between consecutive points.
+        """
+        return np.diff(self.data)
+
+    @cached_property
+    def rising(self) -> np.ndarray:
+        """
+        Flag the steps that do not decrease.
+        """
+        return self.steps >= 0
+
+    @cached_property
+    def falling(self) -> np.ndarray:
+        """
+        Flag the steps that do not increase.
+        """
+        return self.steps <= 0
+
+    def outside(self, sigmas: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Flag the points above and below the limits at a number of standard
+        deviations from the mean.
+
+        Args:
+            sigmas: The number of standard deviations to the limits
+
+        Returns:
+            The boolean arrays of the points above the upper limit and below
+            the lower limit.
+        """
+        if sigmas not in self.above:
+            self.above[sigmas] = self.data > self.mean + (sigmas * self.std)
+            self.below[sigmas] = self.data < self.mean - (sigmas * self.std)
+        return self.above[sigmas], self.below[sigmas]
 
 
 class Rule:
     """
     The base class for all rules.
+
+    Each rule checks every window of window_size consecutive points.
     """
-    def run(
-        self,
-        data: list[float],
-        mean: float,
-        std: float,
-        verbose: bool=False
-    ) -> None:
+    window_size = 1
+
+    def run(self, ctx: RuleContext, verbose: bool=False) -> None:
         pass
 
 
@@ -31,24 +111,15 @@ class LimitRule(Rule):
         self.window_size = window_size
         self.fail_count = fail_count
 
-    def run(
-        self,
-        data: list[float],
-        mean: float,
-        std: float,
-        verbose: bool=False
-    ) -> None:
+    def run(self, ctx: RuleContext, verbose: bool=False) -> None:
         """
         Find the datapoints that present issues in the window_size.
 
         Args:
-            data: A dataset of points to analyze
-            mean: The computed mean of the dataset
-            std: The computed standard deviation of the dataset
+            ctx: The dataset to analyze and its precomputed statistics
         """
-        issues = []
-        upper_limit = mean + (self.sigmas * std)
-        lower_limit = mean - (self.sigmas * std)
+        upper_limit = ctx.mean + (self.sigmas * ctx.std)
+        lower_limit = ctx.mean - (self.sigmas * ctx.std)
 
         if verbose:
             print(f"===== {type(self).__name__} =====")
@@ -56,20 +127,16 @@ class LimitRule(Rule):
             print(f"upper limit: {upper_limit}")
             print(f"lower limit: {lower_limit}")
 
-        last = None
-        for idx, window in enumerate(
-            sliding_window(data, self.window_size)
-        ):
-            count_above = sum([
-                1 if point > upper_limit else 0
-                for point in window
-            ])
-            count_below = sum([
-                1 if point < lower_limit else 0
-                for point in window
-            ])
-            if count_above >= self.fail_count or count_below >= self.fail_count:
-                issues.append((type(self).__name__, idx + 1))
+        above, below = ctx.outside(self.sigmas)
+        hits = np.nonzero(count_outside(
+            pack_mask(above),
+            pack_mask(below),
+            len(ctx.data),
+            self.window_size,
+            self.fail_count
+        ))[0]
+
+        issues = [(type(self).__name__, int(idx) + 1) for idx in hits]
 
         if verbose:
             print(f"detected: {issues}")
@@ -116,34 +183,22 @@ class SingleSideConsecutiveRule(Rule):
     Detect any set of eight consecutive points on one side of the center
     line.
     """
-    def run(
-        self,
-        data: list[float],
-        mean: float,
-        std: float,
-        verbose: bool=False
-    ) -> None:
+    window_size = 8
+
+    def run(self, ctx: RuleContext, verbose: bool=False) -> None:
         """
         Execute Rule 4.
 
         Args:
-            data: A dataset of points to analyze
-            mean: The computed mean of the dataset
-            std: The computed standard deviation of the dataset
+            ctx: The dataset to analyze and its precomputed statistics
         """
-        issues = []
-
         if verbose:
             print(f"===== {type(self).__name__} =====")
 
-        for idx, window in enumerate(
-            sliding_window(data, 8)
-        ):
-            if (
-                (max(window) > mean and min(window) > mean)
-                or (max(window) < mean and min(window) < mean)
-            ):
-                issues.append((type(self).__name__, idx + 1))
+        mins, maxs = rolling_minmax(ctx.data, self.window_size)
+        hits = np.nonzero((mins > ctx.mean) | (maxs < ctx.mean))[0]
+
+        issues = [(type(self).__name__, int(idx) + 1) for idx in hits]
 
         if verbose:
             print(f"detected: {issues}")
@@ -158,31 +213,26 @@ class RunRule(Rule):
     Detect any set of six consecutive points that either all increase or all
     decrease.
     """
-    def run(
-        self,
-        data: list[float],
-        mean: float,
-        std: float,
-        verbose: bool=False
-    ) -> None:
+    window_size = 6
+
+    def run(self, ctx: RuleContext, verbose: bool=False) -> None:
         """
         Execute Rule 5.
 
         Args:
-            data: A dataset of points to analyze
-            mean: The computed mean of the dataset
-            std: The computed standard deviation of the dataset
+            ctx: The dataset to analyze and its precomputed statistics
         """
-        issues = []
-
         if verbose:
             print(f"===== {type(self).__name__} =====")
 
-        for idx, window in enumerate(
-            sliding_window(data, 6)
-        ):
-            if window == sorted(window) or window == sorted(window, reverse=True):
-                issues.append((type(self).__name__, idx + 1))
+        # a window of points is sorted when all of its steps share a direction
+        # (equal points are allowed in either direction)
+        steps = self.window_size - 1
+        rising = window_counts(ctx.rising, steps)
+        falling = window_counts(ctx.falling, steps)
+        hits = np.nonzero((rising == steps) | (falling == steps))[0]
+
+        issues = [(type(self).__name__, int(idx) + 1) for idx in hits]
 
         if verbose:
             print(f"detected: {issues}")
@@ -197,35 +247,24 @@ class CycleRule(Rule):
     Detect any cyclical patterns: points alternating up and down over 14
     samples.
     """
-    def run(
-        self,
-        data: list[float],
-        mean: float,
-        std: float,
-        verbose: bool=False
-    ) -> None:
+    window_size = 15
+
+    def run(self, ctx: RuleContext, verbose: bool=False) -> None:
         """
         Execute Rule 7.
 
         Args:
-            data: A dataset of points to analyze
-            mean: The computed mean of the dataset
-            std: The computed standard deviation of the dataset
+            ctx: The dataset to analyze and its precomputed statistics
         """
-        issues = []
-
         if verbose:
             print(f"===== {type(self).__name__} =====")
 
-        last_cycle = None
-        for idx, window in enumerate(
-            sliding_window(data, 15)
-        ):
-            if is_cycle(window):
-                # detects cycles larger than the window size
-                if last_cycle != idx - 1:
-                    issues.append((type(self).__name__, idx + 1))
-                last_cycle = idx
+        cycles = cycle_mask(ctx.rising, self.window_size)
+        # detects cycles larger than the window size
+        starts = cycles & ~np.concatenate(([False], cycles[:-1]))
+        hits = np.nonzero(starts)[0]
+
+        issues = [(type(self).__name__, int(idx) + 1) for idx in hits]
 
         if verbose:
             print(f"detected: {issues}")
@@ -239,39 +278,28 @@ class ZoneCCycleRule(Rule):
 
     Detect any cyclical patterns within 1 standard deviation from the mean.
     """
-    def run(
-        self,
-        data: list[float],
-        mean: float,
-        std: float,
-        verbose: bool=False
-    ) -> None:
+    window_size = 14
+
+    def run(self, ctx: RuleContext, verbose: bool=False) -> None:
         """
         Execute Rule 6.
 
         Args:
-            data: A dataset of points to analyze
-            mean: The computed mean of the dataset
-            std: The computed standard deviation of the dataset
+            ctx: The dataset to analyze and its precomputed statistics
         """
-        issues = []
-        upper_limit = mean + std
-        lower_limit = mean - std
+        upper_limit = ctx.mean + ctx.std
+        lower_limit = ctx.mean - ctx.std
 
         if verbose:
             print(f"===== {type(self).__name__} =====")
             print(f"upper_limit: {upper_limit}")
             print(f"lower_limit: {lower_limit}")
 
-        for idx, window in enumerate(
-            sliding_window(data, 14)
-        ):
-            if (
-                is_cycle(window)
-                and min(window) > lower_limit
-                and max(window) < upper_limit
-            ):
-                issues.append((type(self).__name__, idx + 1))
+        cycles = cycle_mask(ctx.rising, self.window_size)
+        in_zone = window_counts(ctx.in_zone, self.window_size)
+        hits = np.nonzero(cycles & (in_zone == self.window_size))[0]
+
+        issues = [(type(self).__name__, int(idx) + 1) for idx in hits]
 
         if verbose:
             print(f"detected: {issues}")
@@ -286,51 +314,26 @@ class MissingZoneCRule(Rule):
     Detect all sets of eight consecutive points that do not include a point
     within 1 standard deviation from the mean.
     """
-    def _points_in_zone_c(
-        self,
-        points: list[float],
-        mean: float,
-        std: float
-    ) -> bool:
-        """
-        Detect if all of the points are within one standard deviation from the
-        mean.
-        """
-        upper_limit = mean + std
-        lower_limit = mean - std
-
-        for point in points:
-            if point > lower_limit and point < upper_limit:
-                return True
-        return False
-
-    def run(
-        self,
-        data: list[float],
-        mean: float,
-        std: float,
-        verbose: bool=False
-    ) -> None:
+    window_size = 8
+
+    def run(self, ctx: RuleContext, verbose: bool=False) -> None:
         """
         Execute Rule 8.
 
         Args:
-            data: A dataset of points to analyze
-            mean: The computed mean of the dataset
-            std: The computed standard deviation of the dataset
+            ctx: The dataset to analyze and its precomputed statistics
         """
-        issues = []
-
         if verbose:
             print(f"===== {type(self).__name__} =====")
-            print(f"upper_limit: {mean + std}")
-            print(f"lower_limit: {mean - std}")
+            print(f"upper_limit: {ctx.mean + ctx.std}")
+            print(f"lower_limit: {ctx.mean - ctx.std}")
 
-        for idx, window in enumerate(
-            sliding_window(data, 8)
-        ):
-            if not self._points_in_zone_c(window, mean, std):
-                issues.append((type(self).__name__, idx + 1))
+        counts = window_popcounts(
+            pack_mask(ctx.in_zone), len(ctx.data), self.window_size
+        )
+        hits = np.nonzero(counts == 0)[0]
+
+        issues = [(type(self).__name__, int(idx) + 1) for idx in hits]
 
         if verbose:
             print(f"detected: {issues}")
@@ -345,27 +348,20 @@ class NearLimitRule(Rule):
     Detect any points that are within 0.25 standard deviations from the control
     limit (3 standard deviations) or the warning limit (2 stanard deviations).
     """
-    def run(
-        self,
-        data: list[float],
-        mean: float,
-        std: float,
-        verbose: bool=False
-    ) -> None:
+    near = 0.25
+
+    def run(self, ctx: RuleContext, verbose: bool=False) -> None:
         """
         Execute Rule 10.
 
         Args:
-            data: A dataset of points to analyze
-            mean: The computed mean of the dataset
-            std: The computed standard deviation of the dataset
+            ctx: The dataset to analyze and its precomputed statistics
         """
-        issues = []
-        near = 0.25
-        ucl = mean + (3 * std)
-        lcl = mean - (3 * std)
-        uwl = mean + (2 * std)
-        lwl = mean - (2 * std)
+        near = self.near
+        ucl = ctx.mean + (3 * ctx.std)
+        lcl = ctx.mean - (3 * ctx.std)
+        uwl = ctx.mean + (2 * ctx.std)
+        lwl = ctx.mean - (2 * ctx.std)
 
         if verbose:
             print(f"===== {type(self).__name__} =====")
@@ -373,14 +369,16 @@ class NearLimitRule(Rule):
             print(f"ucl: {ucl}\nlcl: {lcl}")
             print(f"uwl: {uwl}\nlwl: {lwl}")
 
-        for idx, point in enumerate(data):
-            if (
-                (point < ucl and point > ucl - (near * std))
-                or (point < uwl and point > uwl - (near * std))
-                or (point > lcl and point < lcl + (near * std))
-                or (point > lwl and point < lwl + (near * std))
-            ):
-                issues.append((type(self).__name__, idx + 1))
+        data = ctx.data
+        band = near * ctx.std
+        hits = np.nonzero(
+            ((data < ucl) & (data > ucl - band))
+            | ((data < uwl) & (data > uwl - band))
+            | ((data > lcl) & (data < lcl + band))
+            | ((data > lwl) & (data < lwl + band))
+        )[0]
+
+        issues = [(type(self).__name__, int(idx) + 1) for idx in hits]
 
         if verbose:
             print(f"detected: {issues}")
@@ -388,6 +386,146 @@ class NearLimitRule(Rule):
         return issues
 
 
+# the row of the hits array filled in by scan_all_rules for each rule
+fused_rows = {
+    ControlLimitRule: _kernels.CONTROL_LIMIT,
+    WarningLimitRule: _kernels.WARNING_LIMIT,
+    ZoneCLimitRule: _kernels.ZONE_C_LIMIT,
+    SingleSideConsecutiveRule: _kernels.SINGLE_SIDE,
+    RunRule: _kernels.RUN,
+    CycleRule: _kernels.CYCLE,
+    ZoneCCycleRule: _kernels.ZONE_C_CYCLE,
+    MissingZoneCRule: _kernels.MISSING_ZONE_C,
+    NearLimitRule: _kernels.NEAR_LIMIT
+}
+
+
+def _fused_parameters(rules: list[Rule]):
+    """
+    Read the parameters of scan_all_rules from a list of rules.
+
+    The fused scan always checks every rule it knows, so a rule missing from
+    the list is scanned with its defaults but never reported.
+
+    Args:
+        rules: The rules to report, in the order to report them
+
+    Returns:
+        The (row, rule) pairs to report, followed by the window sizes, sigmas,
+        fail counts and nearness to pass to scan_all_rules.
+
+    Raises:
+        ValueError: If the list holds a rule that scan_all_rules cannot run or
+            holds the same rule twice.
+    """
+    order = []
+    by_row = {}
+    for rule in rules:
+        row = fused_rows.get(type(rule))
+        if row is None:
+            raise ValueError(
+                f"scan_all_rules cannot run {type(rule).__name__}"
+            )
+        if row in by_row:
+            raise ValueError(f"{type(rule).__name__} is listed more than once")
+        order.append((row, rule))
+        by_row[row] = rule
+
+    for rule_type, row in fused_rows.items():
+        if row not in by_row:
+            by_row[row] = rule_type()
+    fused = [by_row[row] for row in range(_kernels.N_RULES)]
+
+    window_sizes = np.array(
+        [rule.window_size for rule in fused], dtype=np.int64
+    )
+    sigmas = np.array(
+        [getattr(rule, "sigmas", 0) for rule in fused], dtype=np.float64
+    )
+    fail_counts = np.array(
+        [getattr(rule, "fail_count", 0) for rule in fused], dtype=np.int64
+    )
+    near = fused[_kernels.NEAR_LIMIT].near
+
+    return order, window_sizes, sigmas, fail_counts, near
+
+
+def run_all(ctx: RuleContext) -> list[tuple[str, int]]:
+    """
+    Execute every rule in a single fused pass over the dataset.
+
+    Detects the same issues, in the same order, as running each rule in the
+    rules list separately.
+
+    Args:
+        ctx: The dataset to analyze and its precomputed statistics
+    """
+    order, window_sizes, sigmas, fail_counts, near = _fused_parameters(rules)
+
+    hits = np.zeros((_kernels.N_RULES, len(ctx.data)), dtype=np.bool_)
+    scan_all_rules(
+        ctx.data,
+        ctx.mean,
+        ctx.std,
+        window_sizes,
+        sigmas,
+        fail_counts,
+        near,
+        hits
+    )
+
+    return _fused_issues(hits, order)
+
+
+def run_batch(series: np.ndarray) -> list[list[tuple[str, int]]]:
+    """
+    Execute every rule over a batch of independent series in parallel.
+
+    Each series is analyzed against its own mean and standard deviation.
+
+    Args:
+        series: A 2-D array with one series of equal length per row
+
+    Returns:
+        The issues detected in each series, in the same order as the rows.
+    """
+    order, window_sizes, sigmas, fail_counts, near = _fused_parameters(rules)
+
+    series = np.ascontiguousarray(series, dtype=np.float64)
+    means = np.mean(series, axis=1)
+    stds = np.std(series, axis=1)
+
+    hits = np.zeros(
+        (len(series), _kernels.N_RULES, series.shape[1]), dtype=np.bool_
+    )
+    scan_batch(
+        series,
+        means,
+        stds,
+        window_sizes,
+        sigmas,
+        fail_counts,
+        near,
+        hits
+    )
+
+    return [_fused_issues(series_hits, order) for series_hits in hits]
+
+
+def _fused_issues(
+    hits: np.ndarray,
+    order: list[tuple[int, Rule]]
+) -> list[tuple[str, int]]:
+    """
+    Convert the hits array filled in by scan_all_rules into issues.
+    """
+    return [
+        (type(rule).__name__, int(idx) + 1)
+        for row, rule in order
+        for idx in np.nonzero(hits[row])[0]
+    ]
+
+
 rules = [
     ControlLimitRule(),
     WarningLimitRule(),
@@ -397,6 +535,10 @@ rules = [
     CycleRule(),
     ZoneCCycleRule(),
     MissingZoneCRule(),
-    MissingZoneCRule(),
+    # Rule 9 (an unusual or nonrandom pattern) is too vague to implement
     NearLimitRule()
 ]
+
+# fail at import rather than on the first run_all if the fused scan cannot
+# run the rules list
+_fused_parameters(rules)
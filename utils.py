@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def sliding_window(arr: list[float], window_size: int, start: int=0):
     """
     Iterate all winows of a given size for the array.
@@ -24,7 +27,7 @@ def is_cycle(arr: list[float]) -> bool:
     """
     # Assuming a minimum of four points are needed to establish a cyclic pattern
     if len(arr) < 4:
-        return False, []
+        return False
 
     is_increasing = False if arr[1] - arr[0] < 0 else True
 
@@ -37,3 +40,22 @@ def is_cycle(arr: list[float]) -> bool:
         is_increasing = next_step
 
     return True
+
+
+def window_counts(mask: np.ndarray, window_size: int) -> np.ndarray:
+    """
+    Count the True values in every window of a given size for the mask.
+
+    Args:
+        mask: A boolean array flagging the points to count
+        window_size: The static size of the window to use.
+
+    Returns:
+        An array with the count for each window, indexed by the start of the
+        window.
+    """
+    # bool arrays are already one byte per flag, so read them as int8 in place
+    counts = np.zeros(len(mask) + 1, dtype=np.int32)
+    np.cumsum(mask.view(np.int8), dtype=np.int32, out=counts[1:])
+    return counts[window_size:] - counts[:-window_size]
+